@@ -1,15 +1,51 @@
 import os
+import sys
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import threading
 import time
 import re
+import shutil
 import uuid
+import bisect
 import json
-from collections import deque
-from flask import Flask, render_template, request, jsonify
+import logging
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from urllib.parse import quote
+from flask import Flask, render_template, stream_template, request, jsonify, Response, make_response, send_from_directory, abort
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.utils import safe_join
+
+# orjson is optional - several times faster than the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 app = Flask(__name__)
 
+if orjson:
+    class OrjsonProvider(DefaultJSONProvider):
+        """jsonify()/request.get_json() through orjson - /queue/downloaded can be the whole library"""
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_SORT_KEYS if self.sort_keys else 0).decode()
+        
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+    
+    app.json = OrjsonProvider(app)
+
+# Plain messages without a level/time prefix, like the print() output.
+# LOG_LEVEL=DEBUG shows per-item detail that is skipped (not even formatted)
+# at the default INFO
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s")
+log = logging.getLogger("vod")
+
 # CONFIG
 XC_URL = os.getenv("XC_URL", "http://provider-url.com:8080")
 XC_USER = os.getenv("XC_USER", "username")
@@ -21,18 +57,97 @@ if DB_FILE_PATH:
     DOWNLOADED_DB_FILE = DB_FILE_PATH
 else:
     # Default: same directory as app.py
-    DOWNLOADED_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "downloaded_items.json")
+    DOWNLOADED_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "downloaded_items.db")
+# Older versions kept the database as JSON; a DB_FILE_PATH still pointing at
+# the .json file keeps working and the SQLite file is created next to it
+if DOWNLOADED_DB_FILE.endswith(".json"):
+    DOWNLOADED_DB_FILE = os.path.splitext(DOWNLOADED_DB_FILE)[0] + ".db"
+LEGACY_JSON_DB_FILE = os.path.splitext(DOWNLOADED_DB_FILE)[0] + ".json"
+
+# Read/write block size for downloads - larger blocks mean fewer Python-level
+# iterations and write() calls per file
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+# Output file buffer - two reads are coalesced into each write() syscall
+DOWNLOAD_WRITE_BUFFER = 8 * 1024 * 1024
+# Minimum seconds between progress updates - the UI only refreshes about once a second
+PROGRESS_INTERVAL = 0.25
+# Downloaded files are never re-read, so ask the kernel to drop them from the
+# page cache as we go (Linux only) instead of evicting pages other code needs
+HAS_FADVISE = hasattr(os, 'posix_fadvise')
+PAGE_CACHE_WINDOW = 64 * 1024 * 1024
+# Reserve the whole file up front when the size is known, so the filesystem
+# allocates one extent instead of extending the file write by write
+HAS_FALLOCATE = hasattr(os, 'posix_fallocate')
+# Parallel HTTP Range connections per download. Off (1) by default because most
+# Xtream providers count every connection against the account's stream limit
+DOWNLOAD_SEGMENTS = max(1, int(os.getenv("DOWNLOAD_SEGMENTS", "1")))
+SEGMENT_MIN_SIZE = 64 * 1024 * 1024  # Smaller files are not worth splitting
+# Number of files downloaded at the same time. Off (1) by default for the same
+# reason as DOWNLOAD_SEGMENTS - providers limit concurrent connections
+DOWNLOAD_WORKERS = max(1, int(os.getenv("DOWNLOAD_WORKERS", "1")))
+# Internal nginx location that aliases DOWNLOAD_PATH. When set, /files/ only
+# authorizes the request and nginx streams the file itself with sendfile()
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX", "")
+# Each open /events stream (one per browser tab) holds a server thread for as
+# long as the tab is open. Keep well below the server's thread count (16 in
+# the Dockerfile/wsgi.py/waitress setup); extra tabs fall back to polling
+EVENT_STREAM_MAX_CLIENTS = max(0, int(os.getenv("EVENT_STREAM_MAX_CLIENTS", "8")))
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 }
 
+# Shared HTTP session - keeps connections to the provider alive and pooled
+# across API calls and downloads instead of a new handshake per request
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+# Retry failed connection attempts with a short backoff. Read errors are not
+# retried: a stalled provider would otherwise hold a request thread for every
+# retry's full timeout. HTTP error statuses still go straight to raise_for_status()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                       max_retries=Retry(total=3, read=0, backoff_factor=0.3))
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
+# Video files are already compressed. Asking for the bytes as-is keeps
+# Content-Length (and Range offsets) in file bytes and lets the copy loops
+# read straight from the socket without a decompressor in between
+DOWNLOAD_HEADERS = {"Accept-Encoding": "identity"}
+
+# Provider responses (category lists, streams, series info) change rarely,
+# so successful API calls are cached in-process for API_CACHE_TTL seconds
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", "900"))
+# Series info gains episodes while a season airs, so it expires sooner
+API_CACHE_TTL_BY_ACTION = {"get_series_info": min(API_CACHE_TTL, 300)}
+API_CACHE_MAX_ENTRIES = 256
+_API_CACHE = OrderedDict()  # (action, params) -> (expires_at, data), least recently used first
+_API_CACHE_LOCK = threading.Lock()
+
+# Small pool for running independent provider calls concurrently
+EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
 # --- GLOBAL STATE & QUEUE ---
 # Thread-safe queue management
 QUEUE_LOCK = threading.Lock()
-JOB_QUEUE = deque()  # List of dicts: {id, url, filepath, display_name, kind, item_id}
+# Pending jobs in download order, keyed by job id so remove/reorder are O(1)
+JOB_QUEUE = OrderedDict()  # job_id -> {id, url, filepath, display_name, kind, item_id}
+# Condition on QUEUE_LOCK - producers notify it after appending to JOB_QUEUE
+# so idle workers wake up at once instead of polling
+JOB_READY = threading.Condition(QUEUE_LOCK)
+# Bumped (under QUEUE_LOCK) whenever JOB_QUEUE changes; /queue/list uses it
+# as its ETag, prefixed per process so a restart never matches an old one
+QUEUE_VERSION = 0
+_QUEUE_ETAG_PREFIX = uuid.uuid4().hex[:8]
+
+def queue_changed():
+    """Record a JOB_QUEUE change - call with QUEUE_LOCK held"""
+    global QUEUE_VERSION
+    QUEUE_VERSION += 1
 QUEUE_PAUSED = False
 QUEUE_STOPPED = False
+# Notified when QUEUE_PAUSED/QUEUE_STOPPED change so paused or stopped workers
+# sleep until resumed instead of polling the flags
+QUEUE_CONTROL = threading.Condition()
 
 # Track queued items by ID for "Already in Queue" detection
 QUEUED_ITEMS = set()  # Set of item IDs (movie/stream IDs)
@@ -45,6 +160,11 @@ DOWNLOADED_ITEMS = {}  # Dict of item_id -> download info
 # Format: {filename_pattern: {"filename": str, "size_mb": float, "scanned_at": timestamp}}
 SCANNED_FILES = {}  # Dict of normalized filename -> file info
 
+# SQLite connection behind DOWNLOADED_ITEMS, opened by load_downloaded_items().
+# Shared by all threads, so every use goes through _DB_LOCK
+DB_CONN = None
+_DB_LOCK = threading.Lock()
+
 DOWNLOAD_STATE = {
     "is_downloading": False,
     "current_file": "Idle",
@@ -57,95 +177,187 @@ DOWNLOAD_STATE = {
     "stopped": False
 }
 
+# DOWNLOAD_STATE is never mutated in place: writers build a new dict and
+# rebind the name, so readers always see one consistent version without locking
+_STATE_WRITE_LOCK = threading.Lock()  # Serializes writers only
+
+def update_download_state(**changes):
+    """Publish a new DOWNLOAD_STATE with the given fields changed"""
+    global DOWNLOAD_STATE
+    with _STATE_WRITE_LOCK:
+        DOWNLOAD_STATE = dict(DOWNLOAD_STATE, **changes)
+
+# job_id -> DownloadProgress for every job currently being downloaded,
+# guarded by QUEUE_LOCK
+ACTIVE_DOWNLOADS = {}
+
+# Notified whenever DOWNLOAD_STATE or the queue changes so /events
+# subscribers can push an update instead of polling /status
+STATE_COND = threading.Condition()
+STATE_VERSION = 0  # Bumped on every change, guarded by STATE_COND
+EVENT_STREAM_CLIENTS = 0  # Open /events streams, guarded by STATE_COND
+
+def notify_state_change():
+    """Wake any /events subscribers waiting for a state change"""
+    global STATE_VERSION
+    with STATE_COND:
+        STATE_VERSION += 1
+        STATE_COND.notify_all()
+
+def json_loads(data):
+    """Parse JSON from bytes or str, with orjson when it is installed"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def json_dumps(obj):
+    """Serialize to a compact JSON str, with orjson when it is installed"""
+    return orjson.dumps(obj).decode() if orjson else json.dumps(obj, separators=(',', ':'))
+
+# Characters that are not allowed in filenames (plus ASCII control
+# characters such as NUL), deleted in one C-level pass
+_FILENAME_DELETE_TABLE = str.maketrans('', '', '<>:"/\\|?*' + ''.join(map(chr, range(32))))
+
 def sanitize_filename(name):
-    clean = re.sub(r'[<>:"/\\|?*]', '', name)
-    return clean.strip()
+    return name.translate(_FILENAME_DELETE_TABLE).strip()
+
+# Downloads are written to <name><PARTIAL_SUFFIX> and renamed once complete,
+# so an interrupted download is never mistaken for a finished file
+PARTIAL_SUFFIX = ".part"
+# Anything smaller is treated as an empty/corrupted file, not a download
+MIN_FILE_SIZE = 1024 * 1024
+# Container extensions a download can have; artwork, subtitles, .nfo files etc.
+# next to the downloads are skipped before any stat or filename parsing
+MEDIA_EXTENSIONS = frozenset({
+    'mkv', 'mp4', 'm4v', 'avi', 'ts', 'm2ts', 'mts', 'mov', 'webm', 'flv',
+    'wmv', 'mpg', 'mpeg', 'vob', 'ogv', '3gp', 'divx', 'xvid'
+})
+
+# Threads used to stat the download folder's files (0 = one at a time). On a
+# local disk stat() is cached and cheap and the pool only adds overhead, but on
+# a NAS/network mount each stat is a round trip that threads can overlap
+SCAN_STAT_THREADS = max(0, int(os.getenv("SCAN_STAT_THREADS", "0")))
+
+def list_download_files():
+    """
+    {filename: size_in_bytes} for every finished download (a media file
+    > 1MB) in DOWNLOAD_PATH. os.scandir gives the file type from
+    the directory entry, so this is one listing plus one stat per media file.
+    """
+    with os.scandir(DOWNLOAD_PATH) as it:
+        # Downloads still in progress (or interrupted) end in .part, so they
+        # fail the extension check too
+        entries = [entry for entry in it
+                   if entry.name.rpartition('.')[2].lower() in MEDIA_EXTENSIONS and entry.is_file()]
+    if SCAN_STAT_THREADS > 1:
+        with ThreadPoolExecutor(max_workers=SCAN_STAT_THREADS) as pool:
+            sizes = list(pool.map(lambda entry: entry.stat().st_size, entries))
+    else:
+        sizes = [entry.stat().st_size for entry in entries]
+    return {entry.name: size for entry, size in zip(entries, sizes) if size > MIN_FILE_SIZE}
 
 def check_file_exists(filepath):
     """Check if a file already exists and has content"""
-    if os.path.exists(filepath):
-        # Check if file has content (at least 1MB to avoid empty/corrupted files)
-        return os.path.getsize(filepath) > 1024 * 1024
-    return False
+    # One stat: a missing file and a too-small (empty/corrupted) one both mean no
+    try:
+        return os.stat(filepath).st_size > MIN_FILE_SIZE
+    except OSError:
+        return False
+
+def _open_db():
+    """Open (creating if needed) the SQLite database and its table"""
+    db_dir = os.path.dirname(DOWNLOADED_DB_FILE)
+    if db_dir and not os.path.exists(db_dir):
+        print(f"Creating database directory: {db_dir}")
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(DOWNLOADED_DB_FILE, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS downloaded ("
+        "item_id TEXT PRIMARY KEY, downloaded_at REAL, filename TEXT, size_mb REAL)"
+    )
+    conn.commit()
+    return conn
+
+def _import_legacy_json(conn):
+    """
+    Copy records from the old downloaded_items.json into the database, in one
+    transaction - if anything fails nothing is written and the file is left
+    in place, so the import is retried on the next start. Rows already in the
+    database (newer than the file) are kept.
+    """
+    with open(LEGACY_JSON_DB_FILE, 'rb') as f:
+        items = json_loads(f.read())
+    rows = [(item_id, info.get("downloaded_at"), info.get("filename"), info.get("size_mb"))
+            for item_id, info in items.items()]
+    with conn:  # Commits at the end, or rolls back on error
+        conn.executemany("INSERT OR IGNORE INTO downloaded VALUES (?, ?, ?, ?)", rows)
+    # Keep the old file around, but make sure it is not imported again
+    os.replace(LEGACY_JSON_DB_FILE, LEGACY_JSON_DB_FILE + ".migrated")
+    print(f"✓ Imported {len(items)} items from {LEGACY_JSON_DB_FILE}")
 
 def load_downloaded_items():
-    """Load downloaded items from persistent JSON file"""
-    global DOWNLOADED_ITEMS
+    """Open the persistent SQLite database and load it into DOWNLOADED_ITEMS"""
+    global DOWNLOADED_ITEMS, DB_CONN
     print(f"Loading downloaded items database from: {DOWNLOADED_DB_FILE}")
-    if os.path.exists(DOWNLOADED_DB_FILE):
+    is_new = not os.path.exists(DOWNLOADED_DB_FILE)
+    try:
+        DB_CONN = _open_db()
+    except sqlite3.DatabaseError as e:
+        print(f"ERROR: Invalid database file: {e}")
+        print(f"Backing up corrupted file and creating new one...")
         try:
-            with open(DOWNLOADED_DB_FILE, 'r') as f:
-                DOWNLOADED_ITEMS = json.load(f)
-            print(f"✓ Successfully loaded {len(DOWNLOADED_ITEMS)} downloaded items from database")
-        except json.JSONDecodeError as e:
-            print(f"ERROR: Invalid JSON in database file: {e}")
-            print(f"Backing up corrupted file and creating new one...")
-            try:
-                backup_file = DOWNLOADED_DB_FILE + ".backup"
-                os.rename(DOWNLOADED_DB_FILE, backup_file)
-            except:
-                pass
-            DOWNLOADED_ITEMS = {}
+            backup_file = DOWNLOADED_DB_FILE + ".backup"
+            os.rename(DOWNLOADED_DB_FILE, backup_file)
+        except:
+            pass
+        DB_CONN = _open_db()
+    
+    # Decided by the un-migrated file, not by whether the database is new, so
+    # an import that failed once is retried instead of silently skipped
+    if os.path.exists(LEGACY_JSON_DB_FILE):
+        try:
+            _import_legacy_json(DB_CONN)
         except Exception as e:
-            print(f"ERROR: Failed to load downloaded items database: {e}")
+            print(f"ERROR: Failed to import {LEGACY_JSON_DB_FILE} (will retry on next start): {e}")
             import traceback
             traceback.print_exc()
-            DOWNLOADED_ITEMS = {}
-    else:
-        print(f"Database file not found at {DOWNLOADED_DB_FILE}, creating new database")
-        DOWNLOADED_ITEMS = {}
-        # Also scan current download folder to populate initial database
-        scan_and_update_downloaded_files()
-
-def save_downloaded_items():
-    """Save downloaded items to persistent JSON file"""
-    print(f"[DEBUG] save_downloaded_items() called - File: {DOWNLOADED_DB_FILE}, Items: {len(DOWNLOADED_ITEMS)}")
-    try:
-        # Ensure directory exists
-        db_dir = os.path.dirname(DOWNLOADED_DB_FILE)
-        print(f"[DEBUG] Database directory: {db_dir}, exists: {os.path.exists(db_dir) if db_dir else 'N/A'}")
-        
-        if db_dir and not os.path.exists(db_dir):
-            print(f"[DEBUG] Creating database directory: {db_dir}")
-            os.makedirs(db_dir, exist_ok=True)
-            print(f"[DEBUG] Created database directory: {db_dir}")
-        
-        # Check if directory is writable
-        if db_dir and not os.access(db_dir, os.W_OK):
-            print(f"ERROR: Directory {db_dir} is not writable!")
-            return False
-        
-        # Write to temporary file first, then rename (atomic operation)
-        temp_file = DOWNLOADED_DB_FILE + '.tmp'
-        print(f"[DEBUG] Writing to temp file: {temp_file}")
-        with open(temp_file, 'w') as f:
-            json.dump(DOWNLOADED_ITEMS, f, indent=2)
-        
-        print(f"[DEBUG] Temp file written, size: {os.path.getsize(temp_file)} bytes")
-        
-        # Atomic rename
-        print(f"[DEBUG] Renaming {temp_file} to {DOWNLOADED_DB_FILE}")
-        os.replace(temp_file, DOWNLOADED_DB_FILE)
-        
-        # Verify file was created
-        if os.path.exists(DOWNLOADED_DB_FILE):
-            file_size = os.path.getsize(DOWNLOADED_DB_FILE)
-            print(f"✓ Saved {len(DOWNLOADED_ITEMS)} downloaded items to {DOWNLOADED_DB_FILE} ({file_size} bytes)")
-            return True
-        else:
-            print(f"ERROR: File was not created after rename: {DOWNLOADED_DB_FILE}")
-            return False
-    except PermissionError as e:
-        print(f"ERROR: Permission denied writing to {DOWNLOADED_DB_FILE}: {e}")
-        print(f"Please check file permissions for: {os.path.dirname(DOWNLOADED_DB_FILE)}")
-        import traceback
-        traceback.print_exc()
-        return False
-    except Exception as e:
-        print(f"ERROR: Failed to save downloaded items database to {DOWNLOADED_DB_FILE}: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+    
+    rows = DB_CONN.execute("SELECT item_id, downloaded_at, filename, size_mb FROM downloaded").fetchall()
+    DOWNLOADED_ITEMS = {
+        item_id: {"downloaded_at": downloaded_at, "filename": filename, "size_mb": size_mb}
+        for item_id, downloaded_at, filename, size_mb in rows
+    }
+    print(f"✓ Successfully loaded {len(DOWNLOADED_ITEMS)} downloaded items from database")
+    if is_new:
+        # First start - make sure the download folder exists. Existing files
+        # cannot be mapped to item ids by name alone; they are matched when
+        # their category is viewed (see annotate_download_status)
+        os.makedirs(DOWNLOAD_PATH, exist_ok=True)
+
+def _download_record(filename, filepath=None):
+    """DOWNLOADED_ITEMS entry for an item, with the file size if it exists"""
+    file_size_mb = 0
+    if filepath:
+        try:
+            file_size_mb = round(os.stat(filepath).st_size / (1024 * 1024), 2)
+        except OSError:
+            pass  # Not on disk (e.g. marked manually)
+    return {
+        "downloaded_at": time.time(),
+        "filename": filename,
+        "size_mb": file_size_mb
+    }
+
+def _save_records(records):
+    """Write {item_id: record} to the database in one transaction, then mirror it in memory"""
+    with _DB_LOCK:
+        with DB_CONN:  # Commits once at the end, or rolls back on error
+            DB_CONN.executemany(
+                "INSERT OR REPLACE INTO downloaded VALUES (?, ?, ?, ?)",
+                [(item_id, info["downloaded_at"], info["filename"], info["size_mb"])
+                 for item_id, info in records.items()]
+            )
+    DOWNLOADED_ITEMS.update(records)
 
 def mark_item_downloaded(item_id, filename, filepath=None):
     """
@@ -159,66 +371,59 @@ def mark_item_downloaded(item_id, filename, filepath=None):
     Returns:
         bool: True if successful, False otherwise
     """
-    global DOWNLOADED_ITEMS
     if not item_id:
         print("ERROR: Cannot mark item as downloaded - item_id is None")
         return False
     
-    file_size_mb = 0
-    if filepath and os.path.exists(filepath):
-        file_size_mb = round(os.path.getsize(filepath) / (1024 * 1024), 2)
+    # Save to database - one row, not a rewrite of the whole file
+    try:
+        _save_records({item_id: _download_record(filename, filepath)})
+    except Exception as e:
+        print(f"ERROR: Failed to save download record for {item_id} to {DOWNLOADED_DB_FILE}: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
     
-    DOWNLOADED_ITEMS[item_id] = {
-        "downloaded_at": time.time(),
-        "filename": filename,
-        "size_mb": file_size_mb
-    }
+    log.debug("Marked %s as downloaded - Database: %s", item_id, DOWNLOADED_DB_FILE)
+    return True
+
+def mark_items_downloaded(entries):
+    """
+    Mark several items as downloaded in a single database transaction.
     
-    # Save to database
-    if save_downloaded_items():
-        print(f"✓ Marked {item_id} as downloaded - Database: {DOWNLOADED_DB_FILE}")
-        return True
-    else:
-        print(f"ERROR: Failed to save download record for {item_id}")
+    Args:
+        entries: Iterable of (item_id, filename, filepath) tuples
+    
+    Returns:
+        int: Number of items marked (0 if the save failed)
+    """
+    records = {item_id: _download_record(filename, filepath)
+               for item_id, filename, filepath in entries if item_id}
+    if not records:
+        return 0
+    try:
+        _save_records(records)
+    except Exception as e:
+        print(f"ERROR: Failed to save {len(records)} download records to {DOWNLOADED_DB_FILE}: {e}")
+        import traceback
+        traceback.print_exc()
+        return 0
+    log.debug("Marked %d items as downloaded - Database: %s", len(records), DOWNLOADED_DB_FILE)
+    return len(records)
+
+def unmark_item_downloaded(item_id):
+    """Remove an item from the persistent database; returns True if it was there"""
+    if DOWNLOADED_ITEMS.pop(item_id, None) is None:
         return False
+    with _DB_LOCK:
+        DB_CONN.execute("DELETE FROM downloaded WHERE item_id = ?", (item_id,))
+        DB_CONN.commit()
+    return True
 
 def is_item_downloaded(item_id):
     """Check if an item has been downloaded (persistent check)"""
     return item_id in DOWNLOADED_ITEMS
 
-def scan_and_update_downloaded_files():
-    """Scan download directory and update DOWNLOADED_ITEMS database"""
-    global DOWNLOADED_ITEMS
-    if not os.path.exists(DOWNLOAD_PATH):
-        os.makedirs(DOWNLOAD_PATH, exist_ok=True)
-        return
-    
-    # This is a one-time scan to populate the database
-    # We track by item_id, not filepath, so moving files won't affect tracking
-    updated = False
-    for filename in os.listdir(DOWNLOAD_PATH):
-        filepath = os.path.join(DOWNLOAD_PATH, filename)
-        if os.path.isfile(filepath) and os.path.getsize(filepath) > 1024 * 1024:
-            # Try to infer item_id from filename (this is best-effort)
-            # For new downloads, we'll track by item_id directly
-            # This scan is mainly for initial population
-            pass
-    
-    if updated:
-        save_downloaded_items()
-
-# ============================================================================
-# INITIALIZATION
-# ============================================================================
-print("=" * 70)
-print("VOD Downloader - Starting Application")
-print("=" * 70)
-print(f"Download Path: {DOWNLOAD_PATH}")
-print(f"Database File: {DOWNLOADED_DB_FILE}")
-print(f"Database Directory: {os.path.dirname(DOWNLOADED_DB_FILE)}")
-print(f"Database Directory Exists: {os.path.exists(os.path.dirname(DOWNLOADED_DB_FILE))}")
-print("=" * 70)
-
 # ============================================================================
 # INITIALIZATION
 # ============================================================================
@@ -236,43 +441,294 @@ load_downloaded_items()
 
 # Note: auto_scan_on_startup() is called after helper functions are defined (see end of file)
 
-def get_xtream_data(action, params=None):
+_UTF8_CHARSETS = frozenset({'utf-8', 'utf8', 'ascii', 'us-ascii'})
+
+def response_json(r):
+    """
+    Parse a JSON response with the charset handling of r.json(). UTF-8
+    bodies (the norm) go straight from bytes to json_loads, which orjson
+    parses without decoding to str first.
+    """
+    declared = 'charset=' in r.headers.get('content-type', '').lower()
+    if declared and (r.encoding or '').lower() not in _UTF8_CHARSETS:
+        return json_loads(r.text)
+    try:
+        return json_loads(r.content)
+    except ValueError:  # Also covers UnicodeDecodeError and orjson.JSONDecodeError
+        # Undeclared non-UTF-8 body (e.g. Latin-1) - let requests detect the charset
+        return json_loads(r.text)
+
+def get_xtream_data(action, params=None, refresh=False):
+    """
+    Call the Xtream player API. Successful responses are cached for
+    API_CACHE_TTL seconds (or the action's API_CACHE_TTL_BY_ACTION entry);
+    pass refresh=True to bypass the cache.
+    
+    The returned object may be shared with other callers - copy it before
+    modifying it.
+    """
     if params is None: params = {}
+    cache_key = (action, tuple(sorted(params.items())))
+    if not refresh and API_CACHE_TTL > 0:
+        with _API_CACHE_LOCK:
+            entry = _API_CACHE.get(cache_key)
+            if entry:
+                _API_CACHE.move_to_end(cache_key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+    
     params.update({"username": XC_USER, "password": XC_PASS, "action": action})
     try:
-        r = requests.get(f"{XC_URL}/player_api.php", params=params, headers=HEADERS, timeout=15)
+        r = SESSION.get(f"{XC_URL}/player_api.php", params=params, timeout=15)
         r.raise_for_status()
-        return r.json()
+        data = response_json(r)
     except Exception as e:
         print(f"!!! API ERROR ({action}): {e}")
         return []
+    
+    # Only cache real answers so a provider hiccup is retried on the next call
+    ttl = API_CACHE_TTL_BY_ACTION.get(action, API_CACHE_TTL)
+    if data and ttl > 0:
+        now = time.monotonic()
+        with _API_CACHE_LOCK:
+            _API_CACHE[cache_key] = (now + ttl, data)
+            _API_CACHE.move_to_end(cache_key)  # A refreshed key is recently used, not as old as its first insert
+            if len(_API_CACHE) > API_CACHE_MAX_ENTRIES:
+                for key in [k for k, (expires, _) in _API_CACHE.items() if expires <= now]:
+                    del _API_CACHE[key]
+                while len(_API_CACHE) > API_CACHE_MAX_ENTRIES:
+                    _API_CACHE.popitem(last=False)  # Least recently used first
+    return data
 
 # --- BACKGROUND WORKER ---
+class DownloadStopped(Exception):
+    """Raised from inside a transfer to abort it when the queue is stopped"""
+
+def set_queue_flags(paused, stopped):
+    """Change the pause/stop flags and wake every worker waiting on them"""
+    global QUEUE_PAUSED, QUEUE_STOPPED
+    with QUEUE_CONTROL:
+        QUEUE_PAUSED = paused
+        QUEUE_STOPPED = stopped
+        QUEUE_CONTROL.notify_all()
+
+def wait_if_paused():
+    """Block while the queue is paused; raise DownloadStopped if it is stopped"""
+    if QUEUE_PAUSED and not QUEUE_STOPPED:
+        with QUEUE_CONTROL:
+            QUEUE_CONTROL.wait_for(lambda: not QUEUE_PAUSED or QUEUE_STOPPED)
+    if QUEUE_STOPPED:
+        raise DownloadStopped()
+
+class DownloadProgress:
+    """
+    Byte counter for one active download, shared by every thread writing to it.
+    The hot path only bumps the counter; progress_mb/percent are derived
+    from it by state_snapshot() when someone actually reads the state.
+    """
+    def __init__(self, name, total=0):
+        self.name = name
+        self.total = total
+        self.downloaded = 0
+        self.started = False  # True once the server has answered
+        self.failed = False  # Set when one segment fails so the others give up
+        self._lock = threading.Lock()
+        self._last_update = 0.0
+    
+    def add(self, count):
+        """Count written bytes; returns True when a PROGRESS_INTERVAL tick passed"""
+        with self._lock:
+            self.downloaded += count
+        # Wake /events subscribers a few times a second, not once per block
+        now = time.monotonic()
+        if now - self._last_update >= PROGRESS_INTERVAL:
+            self._last_update = now
+            notify_state_change()
+            return True
+        return False
+
+def advise_dontneed(fd, start, length):
+    """Tell the kernel a written byte range will not be read again"""
+    if HAS_FADVISE and length > 0:
+        try:
+            os.posix_fadvise(fd, start, length, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+def preallocate(fd, length):
+    """Reserve length bytes for fd; False if unsupported (the file then just grows as written)"""
+    if not HAS_FALLOCATE or length <= 0:
+        return False
+    try:
+        os.posix_fallocate(fd, 0, length)
+        return True
+    except OSError:  # e.g. EOPNOTSUPP on some network filesystems
+        return False
+
+def finish_file(fd, length):
+    """
+    fsync a completed download before it is marked downloaded, then drop the
+    whole file from the page cache - DONTNEED only evicts pages that are clean
+    """
+    os.fsync(fd)
+    advise_dontneed(fd, 0, length)
+
+class ProgressWriter:
+    """
+    File wrapper handed to shutil.copyfileobj so the copy itself stays a
+    tight read/write loop. Feeds a DownloadProgress and, on its timer ticks,
+    blocks/aborts on pause/stop.
+    """
+    def __init__(self, f, progress):
+        self.f = f
+        self.progress = progress
+        self.written = 0
+        self._dropped = 0  # Bytes already advised out of the page cache
+        if HAS_FADVISE:
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+    
+    def write(self, data):
+        written = self.f.write(data)
+        self.written += len(data)
+        if self.progress.add(len(data)):
+            wait_if_paused()
+        # Lag one window behind so the most recent (likely still dirty) pages are left alone
+        if HAS_FADVISE and self.written - self._dropped >= 2 * PAGE_CACHE_WINDOW:
+            upto = self.written - PAGE_CACHE_WINDOW
+            self.f.flush()
+            advise_dontneed(self.f.fileno(), self._dropped, upto - self._dropped)
+            self._dropped = upto
+        return written
+
+def can_segment(response, total):
+    """Whether a download is worth (and allowed) splitting into parallel Range requests"""
+    # Ranges of an encoded body are ranges of the compressed bytes, not file offsets
+    return (DOWNLOAD_SEGMENTS > 1 and total >= SEGMENT_MIN_SIZE and
+            response.headers.get('Accept-Ranges', '').lower() == 'bytes' and
+            'content-encoding' not in response.headers)
+
+def download_range(url, fd, start, end, progress):
+    """Fetch bytes [start, end] of url and pwrite them at the same offset of fd"""
+    try:
+        _download_range(url, fd, start, end, progress)
+    except BaseException:
+        # Flag it right away so the sibling segments stop at their next chunk,
+        # not once download_segments gets round to this future's result
+        progress.failed = True
+        raise
+
+def _download_range(url, fd, start, end, progress):
+    with SESSION.get(url, stream=True, headers={**DOWNLOAD_HEADERS, 'Range': f'bytes={start}-{end}'}) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise IOError(f"Server ignored Range request (HTTP {r.status_code})")
+        r.raw.decode_content = 'content-encoding' in r.headers  # Only if the server ignored identity
+        offset = dropped = start
+        while offset <= end:
+            if progress.failed:
+                return
+            chunk = r.raw.read(min(DOWNLOAD_CHUNK_SIZE, end + 1 - offset))
+            if not chunk:
+                break
+            view = memoryview(chunk)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                view = view[written:]
+                offset += written
+            if progress.add(len(chunk)):
+                wait_if_paused()
+            if offset - dropped >= 2 * PAGE_CACHE_WINDOW:
+                advise_dontneed(fd, dropped, offset - PAGE_CACHE_WINDOW - dropped)
+                dropped = offset - PAGE_CACHE_WINDOW
+    if offset != end + 1:
+        raise IOError(f"Segment {start}-{end} ended early at byte {offset}")
+
+def download_segments(url, filepath, progress):
+    """Download url into filepath over DOWNLOAD_SEGMENTS parallel Range requests"""
+    total = progress.total
+    size = -(-total // DOWNLOAD_SEGMENTS)  # Ceiling division
+    ranges = [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+    
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if not preallocate(fd, total):
+            os.ftruncate(fd, total)
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [pool.submit(download_range, url, fd, start, end, progress)
+                       for start, end in ranges]
+            for future in futures:
+                future.result()
+        finish_file(fd, total)
+    finally:
+        os.close(fd)
+
+def state_snapshot():
+    """
+    Copy of DOWNLOAD_STATE with the live fields (byte progress of the active
+    downloads, queue size, pause/stop flags) filled in at read time. The
+    top-level progress fields are the totals; 'downloads' has one entry per
+    active job. Must not be called while holding QUEUE_LOCK.
+    """
+    state = dict(DOWNLOAD_STATE)
+    with QUEUE_LOCK:
+        state['queue_size'] = len(JOB_QUEUE)
+        active = list(ACTIVE_DOWNLOADS.values())
+    state['downloads'] = [{
+        'name': p.name,
+        'progress_mb': round(p.downloaded / (1024 * 1024), 2),
+        'total_mb': p.total / (1024 * 1024),
+        'percent': int((p.downloaded / p.total) * 100) if p.total else 0,
+    } for p in active]
+    if active:
+        downloaded = sum(p.downloaded for p in active)
+        total = sum(p.total for p in active)
+        state['is_downloading'] = True
+        state['current_file'] = active[0].name if len(active) == 1 else f"{active[0].name} (+{len(active) - 1} more)"
+        state['progress_mb'] = round(downloaded / (1024 * 1024), 2)
+        state['total_mb'] = total / (1024 * 1024)
+        state['percent'] = int((downloaded / total) * 100) if total else 0
+        if not QUEUE_PAUSED and not QUEUE_STOPPED:
+            state['status'] = "Downloading" if any(p.started for p in active) else "Starting..."
+    state['paused'] = QUEUE_PAUSED
+    state['stopped'] = QUEUE_STOPPED
+    return state
+
+def queued_snapshot():
+    """Immutable copy of QUEUED_ITEMS, safe to hand to a streamed template while workers change the set"""
+    with QUEUE_LOCK:
+        return frozenset(QUEUED_ITEMS)
+
+def discard_partial(part_path):
+    """Delete the .part file of a download that will not complete (it may be fully preallocated)"""
+    try:
+        os.remove(part_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"WARNING: Could not remove partial download {part_path}: {e}")
+
 def worker_loop():
-    global DOWNLOAD_STATE, QUEUE_PAUSED, QUEUE_STOPPED
-    print("--- Background Worker Started ---")
+    print(f"--- Background Worker Started ({threading.current_thread().name}) ---")
     
     while True:
-        # Check if stopped
-        if QUEUE_STOPPED:
-            time.sleep(1)
-            continue
-            
-        # Wait if paused
-        while QUEUE_PAUSED and not QUEUE_STOPPED:
-            DOWNLOAD_STATE['status'] = "Paused"
-            time.sleep(0.5)
+        # Sleep while stopped or paused until /queue/resume wakes us
+        with QUEUE_CONTROL:
+            if QUEUE_PAUSED and not QUEUE_STOPPED:
+                update_download_state(status="Paused")
+            QUEUE_CONTROL.wait_for(lambda: not QUEUE_PAUSED and not QUEUE_STOPPED)
         
         # Get next job from queue
         with QUEUE_LOCK:
-            if len(JOB_QUEUE) == 0:
-                DOWNLOAD_STATE['queue_size'] = 0
-                DOWNLOAD_STATE['is_downloading'] = False
-                DOWNLOAD_STATE['status'] = "Idle"
-                time.sleep(1)
-                continue
-            
-            job = JOB_QUEUE.popleft()
+            if not JOB_QUEUE:
+                if not ACTIVE_DOWNLOADS:
+                    update_download_state(status="Idle")
+                JOB_READY.wait_for(lambda: JOB_QUEUE)
+                continue  # Re-check pause/stop before starting it
+            _, job = JOB_QUEUE.popitem(last=False)
+            queue_changed()
             job_id = job['id']
             url = job['url']
             filepath = job['filepath']
@@ -282,37 +738,37 @@ def worker_loop():
             # Remove from queued items set
             if item_id:
                 QUEUED_ITEMS.discard(item_id)
+            progress = ACTIVE_DOWNLOADS[job_id] = DownloadProgress(display_name)
+        notify_state_change()
         
-        DOWNLOAD_STATE['queue_size'] = len(JOB_QUEUE)
-        DOWNLOAD_STATE['is_downloading'] = True
-        DOWNLOAD_STATE['current_file'] = display_name
-        DOWNLOAD_STATE['status'] = "Starting..."
-        DOWNLOAD_STATE['percent'] = 0
-        
+        part_path = filepath + PARTIAL_SUFFIX
         try:
             print(f"Starting Download: {display_name}")
-            with requests.get(url, stream=True, headers=HEADERS) as r:
+            with SESSION.get(url, stream=True, headers=DOWNLOAD_HEADERS) as r:
                 r.raise_for_status()
-                total = int(r.headers.get('content-length', 0))
-                if total: DOWNLOAD_STATE['total_mb'] = total / (1024 * 1024)
-                
-                downloaded = 0
-                with open(filepath, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=1024*1024):
-                        # Check for pause/stop during download
-                        if QUEUE_STOPPED:
-                            print(f"Download stopped: {display_name}")
-                            break
-                        while QUEUE_PAUSED and not QUEUE_STOPPED:
-                            time.sleep(0.5)
-                        
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            current_mb = downloaded / (1024 * 1024)
-                            DOWNLOAD_STATE['progress_mb'] = round(current_mb, 2)
-                            if total: DOWNLOAD_STATE['percent'] = int((downloaded / total) * 100)
-                            DOWNLOAD_STATE['status'] = "Downloading"
+                progress.total = int(r.headers.get('content-length', 0))
+                progress.started = True
+                segmented = can_segment(r, progress.total)
+                if not segmented:
+                    # Content-Length is then the compressed size, not what gets written
+                    encoded = 'content-encoding' in r.headers
+                    r.raw.decode_content = encoded
+                    with open(part_path, 'wb', buffering=DOWNLOAD_WRITE_BUFFER) as f:
+                        preallocated = not encoded and preallocate(f.fileno(), progress.total)
+                        writer = ProgressWriter(f, progress)
+                        shutil.copyfileobj(r.raw, writer, DOWNLOAD_CHUNK_SIZE)
+                        f.flush()
+                        if preallocated and writer.written != progress.total:
+                            # The reserved tail would otherwise pass for downloaded data
+                            raise IOError(f"Download ended early at byte {writer.written} of {progress.total}")
+                        finish_file(f.fileno(), writer.written)
+            
+            if segmented:
+                print(f"Downloading in {DOWNLOAD_SEGMENTS} segments: {display_name}")
+                download_segments(url, part_path, progress)
+            
+            # Only complete files ever appear under the real name
+            os.replace(part_path, filepath)
             
             if not QUEUE_STOPPED:
                 print(f"Finished: {display_name}")
@@ -322,28 +778,44 @@ def worker_loop():
                 elif not item_id:
                     print(f"WARNING: No item_id for completed download: {display_name}")
 
+        except DownloadStopped:
+            print(f"Download stopped: {display_name}")
+            discard_partial(part_path)
+
         except Exception as e:
             print(f"Failed: {e}")
-            DOWNLOAD_STATE['status'] = "Error"
+            discard_partial(part_path)
+            update_download_state(status="Error")
+            notify_state_change()
             time.sleep(2)
             
         finally:
             with QUEUE_LOCK:
-                DOWNLOAD_STATE['queue_size'] = len(JOB_QUEUE)
-            DOWNLOAD_STATE['is_downloading'] = False
+                ACTIVE_DOWNLOADS.pop(job_id, None)
             if not QUEUE_STOPPED:
-                DOWNLOAD_STATE['status'] = "Idle"
-            DOWNLOAD_STATE['percent'] = 0
+                update_download_state(status="Idle")
+            notify_state_change()
 
-threading.Thread(target=worker_loop, daemon=True).start()
+for worker_num in range(DOWNLOAD_WORKERS):
+    threading.Thread(target=worker_loop, name=f"download-worker-{worker_num + 1}", daemon=True).start()
 
 
 # --- ROUTES ---
 
-@app.route('/')
-def index():
-    movie_cats = get_xtream_data("get_vod_categories")
-    series_cats = get_xtream_data("get_series_categories")
+# (expires_at, combined list) built by build_categories(). It expires together
+# with the get_xtream_data entries it was built from, and the background refresh
+# bypasses those, so the list is never more than one API_CACHE_TTL old.
+_CATEGORIES = None
+_CATEGORIES_LOCK = threading.Lock()
+_CATEGORIES_REFRESHING = False
+
+def _fetch_categories(refresh=False):
+    """Fetch both category lists and merge them into the form index.html uses"""
+    global _CATEGORIES
+    # Both category lists are independent - fetch them concurrently
+    movie_future = EXECUTOR.submit(get_xtream_data, "get_vod_categories", refresh=refresh)
+    series_future = EXECUTOR.submit(get_xtream_data, "get_series_categories", refresh=refresh)
+    movie_cats, series_cats = movie_future.result(), series_future.result()
     
     combined = []
     
@@ -363,41 +835,85 @@ def index():
                 'category_id': c['category_id'], 
                 'display_name': f"[Series] {c['category_name']}"
             })
-            
-    return render_template('index.html', categories=combined)
+    
+    if combined and API_CACHE_TTL > 0:
+        with _CATEGORIES_LOCK:
+            _CATEGORIES = (time.monotonic() + API_CACHE_TTL, combined)
+    return combined
+
+def _refresh_categories_in_background():
+    """Re-fetch the stale category list; the only place that clears _CATEGORIES_REFRESHING"""
+    global _CATEGORIES_REFRESHING
+    try:
+        # The API entries expire with _CATEGORIES, so go to the provider rather than re-wrapping them
+        _fetch_categories(refresh=True)
+    finally:
+        with _CATEGORIES_LOCK:
+            _CATEGORIES_REFRESHING = False
+
+def build_categories(refresh=False):
+    """
+    Combined movie + series category list for the index page. Served from
+    memory; once it goes stale the old list is still returned while a
+    background refresh fetches the new one.
+    """
+    global _CATEGORIES_REFRESHING
+    cached = _CATEGORIES
+    if refresh or cached is None:
+        return _fetch_categories(refresh=refresh)
+    if cached[0] <= time.monotonic():
+        with _CATEGORIES_LOCK:
+            start = not _CATEGORIES_REFRESHING
+            _CATEGORIES_REFRESHING = True
+        if start:
+            # Own thread, not EXECUTOR - _fetch_categories itself waits on EXECUTOR
+            threading.Thread(target=_refresh_categories_in_background, daemon=True).start()
+    return cached[1]
+
+@app.route('/')
+def index():
+    refresh = request.args.get('refresh') == '1'
+    return render_template('index.html', categories=build_categories(refresh=refresh))
+
+def annotate_download_status(items, kind):
+    """
+    Set _is_downloaded on each item (which must carry _item_id). Items not in
+    the database yet are matched against the scanned files, and all matches
+    are saved in one mark_items_downloaded() transaction.
+    """
+    auto_matched = []
+    for item in items:
+        item['_is_downloaded'] = is_item_downloaded(item['_item_id'])
+        if not item['_is_downloaded'] and SCANNED_FILES:
+            matched_file = match_file_to_item(item, item['_item_id'], kind)
+            if matched_file:
+                auto_matched.append((item, matched_file))
+    if auto_matched and mark_items_downloaded(
+            (item['_item_id'], matched_file['filename'], matched_file['filepath'])
+            for item, matched_file in auto_matched):
+        for item, matched_file in auto_matched:
+            item['_is_downloaded'] = True
+            log.debug("[MATCH] Auto-matched %s %s -> %s", kind, item['_item_id'], matched_file['filename'])
 
 @app.route('/streams')
 def streams():
     selection = request.args.get('category')
     if not selection or ":" not in selection: return ""
     cat_type, cat_id = selection.split(":")
+    refresh = request.args.get('refresh') == '1'
     
-    # FIX: We now pass state=DOWNLOAD_STATE so the progress bar doesn't crash
+    # FIX: We now pass state so the progress bar doesn't crash
     if cat_type == "movie":
-        data = get_xtream_data("get_vod_streams", {"category_id": cat_id})
+        data = get_xtream_data("get_vod_streams", {"category_id": cat_id}, refresh=refresh)
+        # Copy the (possibly cached) items before annotating them
+        data = [dict(item, _item_id=f"movie:{item.get('stream_id', '')}") for item in data]
         # Add downloaded status to each item (check by item_id and scanned files)
-        for item in data:
-            item_id = f"movie:{item.get('stream_id', '')}"
-            # First check if already in database
-            if is_item_downloaded(item_id):
-                item['_is_downloaded'] = True
-            else:
-                # Check if matches a scanned file
-                matched_file = match_file_to_item(item, item_id, "movie")
-                if matched_file:
-                    # Auto-mark as downloaded if file matches
-                    filepath = os.path.join(DOWNLOAD_PATH, matched_file['filename'])
-                    if mark_item_downloaded(item_id, matched_file['filename'], filepath):
-                        item['_is_downloaded'] = True
-                        print(f"[MATCH] Auto-matched movie: {item.get('name')} -> {matched_file['filename']}")
-                    else:
-                        item['_is_downloaded'] = False
-                else:
-                    item['_is_downloaded'] = False
-        return render_template('streams_partial.html', items=data, type="movie", state=DOWNLOAD_STATE, queued_items=QUEUED_ITEMS, downloaded_items=DOWNLOADED_ITEMS)
+        annotate_download_status(data, "movie")
+        # Streamed, so a long list starts reaching the browser while Jinja is still rendering it
+        return stream_template('streams_partial.html', items=data, type="movie", state=state_snapshot(), queued_items=queued_snapshot())
     else:
-        data = get_xtream_data("get_series", {"category_id": cat_id})
-        return render_template('streams_partial.html', items=data, type="series", state=DOWNLOAD_STATE, queued_items=QUEUED_ITEMS, downloaded_items=DOWNLOADED_ITEMS)
+        data = get_xtream_data("get_series", {"category_id": cat_id}, refresh=refresh)
+        return stream_template('streams_partial.html', items=data, type="series", state=state_snapshot(), queued_items=queued_snapshot())
 
 @app.route('/episodes/<series_id>')
 def episodes(series_id):
@@ -407,69 +923,65 @@ def episodes(series_id):
     
     # Keep episodes grouped by season for better organization
     episodes_by_season = {}
-    flat_episodes = []
     
     if 'episodes' in data:
         series_name = series_info.get('name', 'Series')
         for season_num, eps in data['episodes'].items():
             season_episodes = []
             for ep in eps:
-                # Check if episode is already downloaded (by item_id)
-                item_id = f"series:{ep.get('id', '')}"
+                ep = dict(ep)  # Don't annotate the cached API response
+                ep['_item_id'] = f"series:{ep.get('id', '')}"
                 ep['_series_name'] = series_name
-                # First check if already in database
-                if is_item_downloaded(item_id):
-                    ep['_is_downloaded'] = True
-                else:
-                    # Check if matches a scanned file
-                    matched_file = match_file_to_item(ep, item_id, "series")
-                    if matched_file:
-                        # Auto-mark as downloaded if file matches
-                        filepath = os.path.join(DOWNLOAD_PATH, matched_file['filename'])
-                        if mark_item_downloaded(item_id, matched_file['filename'], filepath):
-                            ep['_is_downloaded'] = True
-                            print(f"[MATCH] Auto-matched episode: {series_name} S{ep.get('season')}E{ep.get('episode_num')} -> {matched_file['filename']}")
-                        else:
-                            ep['_is_downloaded'] = False
-                    else:
-                        ep['_is_downloaded'] = False
-                ep['_item_id'] = item_id
                 season_episodes.append(ep)
-                flat_episodes.append(ep)
             episodes_by_season[season_num] = season_episodes
+    flat_episodes = list(chain.from_iterable(episodes_by_season.values()))
+    # Check downloaded status (by item_id, then scanned files) for every season at once
+    annotate_download_status(flat_episodes, "series")
                 
-    # FIX: Pass state=DOWNLOAD_STATE here too
-    return render_template('episodes_partial.html', 
-                         episodes=flat_episodes, 
-                         episodes_by_season=episodes_by_season,
-                         series_name=series_name, 
-                         series_id=series_id, 
-                         state=DOWNLOAD_STATE, 
-                         queued_items=QUEUED_ITEMS)
+    # FIX: Pass state here too
+    return stream_template('episodes_partial.html', 
+                          episodes=flat_episodes, 
+                          episodes_by_season=episodes_by_season,
+                          series_name=series_name, 
+                          series_id=series_id, 
+                          state=state_snapshot(), 
+                          queued_items=queued_snapshot())
 
 # --- QUEUE ACTIONS ---
 
+def already_downloaded_response():
+    """Progress bar for a /queue/add that queued nothing; X-Queue-Result lets the button show it as downloaded, not queued"""
+    response = make_response(render_template('progress_bar.html', state=state_snapshot()))
+    response.headers['X-Queue-Result'] = 'downloaded'
+    return response
+
 @app.route('/queue/add/<kind>/<id>/<ext>')
 def queue_item(kind, id, ext):
     global QUEUED_ITEMS
     
-    # Check if already queued
+    # Check if already queued (unlocked fast path, re-checked under the lock below)
     item_id = f"{kind}:{id}"
     if item_id in QUEUED_ITEMS:
         # Return progress bar HTML but with a message indicating already queued
         # The frontend will handle this via HTMX response
-        return render_template('progress_bar.html', state=DOWNLOAD_STATE), 200
+        return render_template('progress_bar.html', state=state_snapshot()), 200
     
     # Check if already downloaded (persistent check)
     if is_item_downloaded(item_id):
         # Item already downloaded, don't add to queue
-        return render_template('progress_bar.html', state=DOWNLOAD_STATE), 200
+        return already_downloaded_response()
     
     title_param = request.args.get('title')
     safe_name = sanitize_filename(title_param) if title_param else f"{id}"
     filename = f"{safe_name}.{ext}"
     local_path = os.path.join(DOWNLOAD_PATH, filename)
     
+    # The file is already there (e.g. downloaded before the database existed) -
+    # record it so the button shows it as downloaded instead of offering it again
+    if check_file_exists(local_path):
+        mark_item_downloaded(item_id, filename, local_path)
+        return already_downloaded_response()
+    
     if kind == "movie":
         url = f"{XC_URL}/movie/{XC_USER}/{XC_PASS}/{id}.{ext}"
     else:
@@ -485,11 +997,18 @@ def queue_item(kind, id, ext):
     }
     
     with QUEUE_LOCK:
-        JOB_QUEUE.append(job)
-        QUEUED_ITEMS.add(item_id)
-        DOWNLOAD_STATE['queue_size'] = len(JOB_QUEUE)
+        # A double click can get here twice - only the first one queues it
+        added = item_id not in QUEUED_ITEMS
+        if added:
+            JOB_QUEUE[job['id']] = job
+            QUEUED_ITEMS.add(item_id)
+            queue_changed()
+            update_download_state(queue_size=len(JOB_QUEUE))
+            JOB_READY.notify()
+    if added:
+        notify_state_change()
     
-    return render_template('progress_bar.html', state=DOWNLOAD_STATE)
+    return render_template('progress_bar.html', state=state_snapshot())
 
 @app.route('/queue/batch_series/<series_id>')
 def queue_entire_series(series_id):
@@ -499,101 +1018,156 @@ def queue_entire_series(series_id):
     series_name = data.get('info', {}).get('name', 'Series')
     safe_series_name = sanitize_filename(series_name)
     
+    # Build the jobs without holding QUEUE_LOCK - the worker and other
+    # requests only wait for the short append loop below
+    jobs = []
+    on_disk = []  # (item_id, filename, filepath) of episodes found already downloaded
+    # (season_num, episode) pairs in order, without building an intermediate list
+    all_episodes = ((season_num, ep) for season_num, eps in data.get('episodes', {}).items() for ep in eps)
+    for season_num, ep in all_episodes:
+        item_id = f"series:{ep['id']}"
+        # Skip if already downloaded (persistent check)
+        if is_item_downloaded(item_id):
+            continue
+        
+        ep_title = ep.get('title', '').replace(f"{season_num}|{ep.get('episode_num')}", "").strip()
+        full_name = f"{safe_series_name} - S{ep['season']}E{ep['episode_num']} - {ep_title}"
+        safe_full_name = sanitize_filename(full_name)
+        
+        ext = ep['container_extension']
+        filename = f"{safe_full_name}.{ext}"
+        local_path = os.path.join(DOWNLOAD_PATH, filename)
+        # Already on disk under the name we would write it to
+        if check_file_exists(local_path):
+            on_disk.append((item_id, filename, local_path))
+            continue
+        
+        url = f"{XC_URL}/series/{XC_USER}/{XC_PASS}/{ep['id']}.{ext}"
+        
+        jobs.append({
+            'id': str(uuid.uuid4()),
+            'url': url,
+            'filepath': local_path,
+            'display_name': safe_full_name,
+            'kind': 'series',
+            'item_id': item_id
+        })
+    
+    if on_disk:
+        mark_items_downloaded(on_disk)
+    
     added_count = 0
     with QUEUE_LOCK:
-        if 'episodes' in data:
-            for season_num, eps in data['episodes'].items():
-                for ep in eps:
-                    item_id = f"series:{ep['id']}"
-                    # Skip if already queued
-                    if item_id in QUEUED_ITEMS:
-                        continue
-                    
-                    ep_title = ep.get('title', '').replace(f"{season_num}|{ep.get('episode_num')}", "").strip()
-                    full_name = f"{safe_series_name} - S{ep['season']}E{ep['episode_num']} - {ep_title}"
-                    safe_full_name = sanitize_filename(full_name)
-                    
-                    ext = ep['container_extension']
-                    filename = f"{safe_full_name}.{ext}"
-                    local_path = os.path.join(DOWNLOAD_PATH, filename)
-                    
-                    # Skip if already downloaded (persistent check)
-                    if is_item_downloaded(item_id):
-                        continue
-                    
-                    url = f"{XC_URL}/series/{XC_USER}/{XC_PASS}/{ep['id']}.{ext}"
-                    
-                    job = {
-                        'id': str(uuid.uuid4()),
-                        'url': url,
-                        'filepath': local_path,
-                        'display_name': safe_full_name,
-                        'kind': 'series',
-                        'item_id': item_id
-                    }
-                    
-                    JOB_QUEUE.append(job)
-                    QUEUED_ITEMS.add(item_id)
-                    added_count += 1
+        for job in jobs:
+            # Skip if already queued
+            if job['item_id'] in QUEUED_ITEMS:
+                continue
+            JOB_QUEUE[job['id']] = job
+            QUEUED_ITEMS.add(job['item_id'])
+            added_count += 1
         
-        DOWNLOAD_STATE['queue_size'] = len(JOB_QUEUE)
+        update_download_state(queue_size=len(JOB_QUEUE))
+        if added_count:
+            queue_changed()
+            JOB_READY.notify_all()
+    notify_state_change()
     
-    return render_template('progress_bar.html', state=DOWNLOAD_STATE)
+    return render_template('progress_bar.html', state=state_snapshot())
 
 @app.route('/status')
 def status():
-    with QUEUE_LOCK:
-        DOWNLOAD_STATE['queue_size'] = len(JOB_QUEUE)
-        DOWNLOAD_STATE['paused'] = QUEUE_PAUSED
-        DOWNLOAD_STATE['stopped'] = QUEUE_STOPPED
-    return render_template('progress_bar.html', state=DOWNLOAD_STATE)
+    """Progress bar partial for external pollers - the page itself follows /events or /status.json"""
+    return render_template('progress_bar.html', state=state_snapshot())
+
+@app.route('/status.json')
+def status_json():
+    """Download state as JSON - lets the page update the bar without re-rendering it"""
+    return jsonify(state_snapshot())
+
+@app.route('/events')
+def events():
+    """
+    Server-sent event stream of download state, pushed only when it changes.
+    Answers 503 once EVENT_STREAM_MAX_CLIENTS streams are open, so tabs
+    cannot use up the server's threads; the page then polls /status.json.
+    """
+    global EVENT_STREAM_CLIENTS
+    with STATE_COND:
+        if EVENT_STREAM_CLIENTS >= EVENT_STREAM_MAX_CLIENTS:
+            return Response("Too many event streams", status=503, mimetype='text/plain')
+        EVENT_STREAM_CLIENTS += 1
+    
+    def release():
+        global EVENT_STREAM_CLIENTS
+        with STATE_COND:
+            EVENT_STREAM_CLIENTS -= 1
+    
+    def stream():
+        last_payload = None
+        seen_version = None
+        while True:
+            with STATE_COND:
+                STATE_COND.wait_for(lambda: STATE_VERSION != seen_version, timeout=15)
+                seen_version = STATE_VERSION
+            payload = json_dumps(state_snapshot())
+            if payload != last_payload:
+                last_payload = payload
+                yield f"data: {payload}\n\n"
+            else:
+                # Comment line keeps idle connections (and proxies) alive
+                yield ": keep-alive\n\n"
+    
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release)  # Runs when the client disconnects
+    return response
 
 # --- QUEUE MANAGEMENT ENDPOINTS ---
 
 @app.route('/queue/list')
 def queue_list():
-    """Get list of all queued items"""
+    """Get list of all queued items (304 if the queue has not changed since the client's copy)"""
     with QUEUE_LOCK:
-        queue_items = []
-        for idx, job in enumerate(JOB_QUEUE):
-            queue_items.append({
-                'index': idx,
-                'id': job['id'],
-                'name': job['display_name'],
-                'kind': job.get('kind', 'unknown'),
-                'item_id': job.get('item_id', '')
-            })
-    return jsonify({'items': queue_items, 'count': len(queue_items)})
+        etag = f"{_QUEUE_ETAG_PREFIX}-{QUEUE_VERSION}"
+        jobs = None if etag in request.if_none_match else list(JOB_QUEUE.values())
+    if jobs is None:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    # Build the response outside the lock so the workers are not held up
+    queue_items = [{
+        'index': idx,
+        'id': job['id'],
+        'name': job['display_name'],
+        'kind': job.get('kind', 'unknown'),
+        'item_id': job.get('item_id', '')
+    } for idx, job in enumerate(jobs)]
+    response = jsonify({'items': queue_items, 'count': len(queue_items)})
+    response.set_etag(etag)
+    return response
 
 @app.route('/queue/pause', methods=['POST'])
 def queue_pause():
     """Pause all downloads"""
-    global QUEUE_PAUSED
-    QUEUE_PAUSED = True
-    DOWNLOAD_STATE['paused'] = True
-    DOWNLOAD_STATE['status'] = "Paused"
+    set_queue_flags(paused=True, stopped=QUEUE_STOPPED)
+    update_download_state(paused=True, status="Paused")
+    notify_state_change()
     return jsonify({'status': 'paused', 'message': 'Downloads paused'})
 
 @app.route('/queue/resume', methods=['POST'])
 def queue_resume():
     """Resume all downloads"""
-    global QUEUE_PAUSED, QUEUE_STOPPED
-    QUEUE_PAUSED = False
-    QUEUE_STOPPED = False
-    DOWNLOAD_STATE['paused'] = False
-    DOWNLOAD_STATE['stopped'] = False
-    DOWNLOAD_STATE['status'] = "Resuming..."
+    set_queue_flags(paused=False, stopped=False)
+    update_download_state(paused=False, stopped=False, status="Resuming...")
+    notify_state_change()
     return jsonify({'status': 'resumed', 'message': 'Downloads resumed'})
 
 @app.route('/queue/stop', methods=['POST'])
 def queue_stop():
     """Stop all downloads (current download will be interrupted)"""
-    global QUEUE_STOPPED, QUEUE_PAUSED
-    QUEUE_STOPPED = True
-    QUEUE_PAUSED = False
-    DOWNLOAD_STATE['stopped'] = True
-    DOWNLOAD_STATE['paused'] = False
-    DOWNLOAD_STATE['status'] = "Stopped"
+    set_queue_flags(paused=False, stopped=True)
+    update_download_state(stopped=True, paused=False, status="Stopped")
+    notify_state_change()
     return jsonify({'status': 'stopped', 'message': 'Downloads stopped'})
 
 @app.route('/queue/clear', methods=['POST'])
@@ -604,7 +1178,9 @@ def queue_clear():
         # Clear queue but keep currently downloading item
         JOB_QUEUE.clear()
         QUEUED_ITEMS.clear()
-        DOWNLOAD_STATE['queue_size'] = 0
+        queue_changed()
+        update_download_state(queue_size=0)
+    notify_state_change()
     return jsonify({'status': 'cleared', 'message': 'Queue cleared'})
 
 @app.route('/queue/remove/<job_id>', methods=['DELETE', 'POST'])
@@ -612,15 +1188,16 @@ def queue_remove(job_id):
     """Remove a specific item from queue by job ID"""
     global QUEUED_ITEMS
     with QUEUE_LOCK:
-        for idx, job in enumerate(JOB_QUEUE):
-            if job['id'] == job_id:
-                removed_job = JOB_QUEUE[idx]
-                JOB_QUEUE.remove(removed_job)
-                item_id = removed_job.get('item_id')
-                if item_id:
-                    QUEUED_ITEMS.discard(item_id)
-                DOWNLOAD_STATE['queue_size'] = len(JOB_QUEUE)
-                return jsonify({'status': 'removed', 'message': f'Removed: {removed_job["display_name"]}'})
+        removed_job = JOB_QUEUE.pop(job_id, None)
+        if removed_job:
+            item_id = removed_job.get('item_id')
+            if item_id:
+                QUEUED_ITEMS.discard(item_id)
+            queue_changed()
+            update_download_state(queue_size=len(JOB_QUEUE))
+    if removed_job:
+        notify_state_change()
+        return jsonify({'status': 'removed', 'message': f'Removed: {removed_job["display_name"]}'})
     return jsonify({'status': 'not_found', 'message': 'Job not found'}), 404
 
 @app.route('/queue/reorder', methods=['POST'])
@@ -631,23 +1208,13 @@ def queue_reorder():
     new_order = data.get('order', [])  # List of job IDs in new order
     
     with QUEUE_LOCK:
-        # Create a map of job_id -> job
-        job_map = {job['id']: job for job in JOB_QUEUE}
-        
-        # Rebuild queue in new order
-        new_queue = deque()
-        for job_id in new_order:
-            if job_id in job_map:
-                new_queue.append(job_map[job_id])
-        
-        # Add any remaining jobs not in the order list
-        for job in JOB_QUEUE:
-            if job['id'] not in new_order:
-                new_queue.append(job)
-        
-        JOB_QUEUE.clear()
-        JOB_QUEUE.extend(new_queue)
-        DOWNLOAD_STATE['queue_size'] = len(JOB_QUEUE)
+        # Move the listed jobs to the front in the given order; jobs not in
+        # the list keep their relative order behind them
+        for job_id in reversed(new_order):
+            if job_id in JOB_QUEUE:
+                JOB_QUEUE.move_to_end(job_id, last=False)
+        queue_changed()
+        update_download_state(queue_size=len(JOB_QUEUE))
     
     return jsonify({'status': 'reordered', 'message': 'Queue reordered'})
 
@@ -660,8 +1227,7 @@ def queue_check(kind, id):
 
 @app.route('/queue/scan', methods=['POST'])
 def scan_downloads():
-    """Manually scan download directory for existing files"""
-    scan_and_update_downloaded_files()
+    """Report the database size - folder files are matched via /queue/scan_files"""
     return jsonify({'status': 'scanned', 'count': len(DOWNLOADED_ITEMS), 'message': f'Database contains {len(DOWNLOADED_ITEMS)} downloaded items'})
 
 @app.route('/queue/downloaded', methods=['GET'])
@@ -675,10 +1241,7 @@ def list_downloaded():
 @app.route('/queue/downloaded/<item_id>', methods=['DELETE', 'POST'])
 def remove_downloaded(item_id):
     """Remove an item from downloaded list (if file was deleted manually)"""
-    global DOWNLOADED_ITEMS
-    if item_id in DOWNLOADED_ITEMS:
-        del DOWNLOADED_ITEMS[item_id]
-        save_downloaded_items()
+    if unmark_item_downloaded(item_id):
         return jsonify({'status': 'removed', 'message': f'Removed {item_id} from downloaded list'})
     return jsonify({'status': 'not_found', 'message': 'Item not found'}), 404
 
@@ -701,6 +1264,21 @@ def db_info():
         'message': f'Database file location: {DOWNLOADED_DB_FILE}'
     })
 
+@app.route('/files/<path:filename>', methods=['GET'])
+def serve_file(filename):
+    """Serve a downloaded file, handing the transfer to nginx when configured"""
+    filepath = safe_join(DOWNLOAD_PATH, filename)
+    if filepath is None or not os.path.isfile(filepath):
+        abort(404)
+
+    # Behind nginx, only authorize here and let it sendfile() straight from disk
+    if ACCEL_REDIRECT_PREFIX:
+        return Response('', headers={
+            'X-Accel-Redirect': f"{ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(filename)}"
+        })
+
+    return send_from_directory(DOWNLOAD_PATH, filename, conditional=True)
+
 @app.route('/queue/mark_downloaded/<kind>/<id>', methods=['POST'])
 def mark_downloaded_manual(kind, id):
     """Manually mark an item as downloaded"""
@@ -749,15 +1327,15 @@ def mark_downloaded_manual(kind, id):
             filename = f"series_episode_{id}"
     
     try:
-        print(f"[DEBUG] mark_downloaded_manual called: kind={kind}, id={id}, item_id={item_id}")
-        print(f"[DEBUG] Database file path: {DOWNLOADED_DB_FILE}")
-        print(f"[DEBUG] Database file exists before: {os.path.exists(DOWNLOADED_DB_FILE)}")
-        db_dir = os.path.dirname(DOWNLOADED_DB_FILE)
-        print(f"[DEBUG] Directory: {db_dir}, exists: {os.path.exists(db_dir)}, writable: {os.access(db_dir, os.W_OK) if os.path.exists(db_dir) else 'N/A'}")
+        log.debug("mark_downloaded_manual called: kind=%s, id=%s, item_id=%s", kind, id, item_id)
+        if log.isEnabledFor(logging.DEBUG):
+            db_dir = os.path.dirname(DOWNLOADED_DB_FILE)
+            log.debug("Database file: %s, exists: %s", DOWNLOADED_DB_FILE, os.path.exists(DOWNLOADED_DB_FILE))
+            log.debug("Directory: %s, exists: %s, writable: %s", db_dir, os.path.exists(db_dir),
+                      os.access(db_dir, os.W_OK) if os.path.exists(db_dir) else 'N/A')
         
         success = mark_item_downloaded(item_id, filename, filepath)
-        print(f"[DEBUG] mark_item_downloaded returned: {success}")
-        print(f"[DEBUG] Database file exists after: {os.path.exists(DOWNLOADED_DB_FILE)}")
+        log.debug("mark_item_downloaded returned: %s", success)
         
         if success:
             print(f"Manually marked {item_id} as downloaded (file: {filename})")
@@ -796,7 +1374,7 @@ def mark_downloaded_batch():
     """Mark multiple items as downloaded"""
     data = request.get_json()
     item_ids = data.get('item_ids', [])
-    marked_count = 0
+    entries = []
     
     for item_id in item_ids:
         if ':' in item_id:
@@ -804,8 +1382,10 @@ def mark_downloaded_batch():
             # Try to find file
             filename = f"{kind}_{id}"
             filepath = os.path.join(DOWNLOAD_PATH, filename)
-            mark_item_downloaded(item_id, filename, filepath)
-            marked_count += 1
+            entries.append((item_id, filename, filepath))
+    
+    # All items share one transaction (and one fsync)
+    marked_count = mark_items_downloaded(entries)
     
     return jsonify({
         'status': 'marked',
@@ -817,7 +1397,7 @@ def mark_downloaded_batch():
 def mark_all_episodes_downloaded(series_id):
     """Mark all episodes in a series as downloaded"""
     data = get_xtream_data("get_series_info", {"series_id": series_id})
-    marked_count = 0
+    entries = []
     
     if 'episodes' in data:
         for season_num, eps in data['episodes'].items():
@@ -832,8 +1412,10 @@ def mark_all_episodes_downloaded(series_id):
                     ext = ep.get('container_extension', 'mp4')
                     filename = f"{safe_full_name}.{ext}"
                     filepath = os.path.join(DOWNLOAD_PATH, filename)
-                    mark_item_downloaded(item_id, filename, filepath)
-                    marked_count += 1
+                    entries.append((item_id, filename, filepath))
+    
+    # All episodes share one transaction (and one fsync)
+    marked_count = mark_items_downloaded(entries)
     
     return jsonify({
         'status': 'marked',
@@ -841,24 +1423,33 @@ def mark_all_episodes_downloaded(series_id):
         'message': f'Marked {marked_count} episodes as downloaded'
     })
 
+# Filename patterns used by the scanner/matcher, compiled once at import
+_SEPARATORS_RE = re.compile(r'[_\-\s]+')
+# S##E##, with the series name in front when the name is "Series - S##E##"
+_EPISODE_RE = re.compile(r'(?:^(?P<series>.+?)\s*-\s*)?S(?P<season>\d+)E(?P<episode>\d+)', re.IGNORECASE)
+
+@lru_cache(maxsize=8192)
 def normalize_filename_for_matching(filename):
-    """Normalize filename for matching - remove extension, lowercase, remove special chars"""
+    """Normalize filename for matching - remove extension, lowercase, remove special chars (cached: titles repeat across pages and scans)"""
     base = os.path.splitext(filename)[0].lower()
     # Remove common separators and normalize spaces
-    base = re.sub(r'[_\-\s]+', ' ', base)
+    base = _SEPARATORS_RE.sub(' ', base)
     return base.strip()
 
 def extract_episode_info(filename):
-    """Extract series name, season, and episode from filename"""
+    """Extract series name, season, and episode from filename (a new dict the caller may update)"""
+    return dict(_episode_info(filename))
+
+@lru_cache(maxsize=8192)
+def _episode_info(filename):
+    """Cached parse behind extract_episode_info - a rescan sees mostly the same names"""
     base = os.path.splitext(filename)[0]
-    # Look for S##E## pattern
-    season_match = re.search(r'S(\d+)E(\d+)', base, re.IGNORECASE)
-    if season_match:
-        season = int(season_match.group(1))
-        episode = int(season_match.group(2))
-        # Try to extract series name (everything before S##E##)
-        series_match = re.search(r'^(.+?)\s*-\s*S\d+E\d+', base, re.IGNORECASE)
-        series_name = series_match.group(1).strip() if series_match else None
+    # Look for S##E## pattern, and the series name in front of it, in one pass
+    match = _EPISODE_RE.search(base)
+    if match:
+        season = int(match.group('season'))
+        episode = int(match.group('episode'))
+        series_name = match.group('series').strip() if match.group('series') else None
         return {
             'type': 'episode',
             'season': season,
@@ -868,52 +1459,52 @@ def extract_episode_info(filename):
         }
     return {'type': 'movie', 'normalized_name': normalize_filename_for_matching(base)}
 
+def scan_download_folder():
+    """Build a new SCANNED_FILES dict ({normalized filename: file info}) from DOWNLOAD_PATH"""
+    scanned = {}
+    for filename, size in list_download_files().items():
+        # Extract metadata from filename
+        file_info = extract_episode_info(filename)
+        file_info.update({
+            'filename': filename,
+            'filepath': os.path.join(DOWNLOAD_PATH, filename),
+            'size_mb': round(size / (1024 * 1024), 2),
+            'scanned_at': time.time()
+        })
+        
+        # Store normalized for matching (and on the entry, for the match index)
+        normalized = normalize_filename_for_matching(filename)
+        file_info['_normalized'] = normalized
+        file_info['_nlen'] = len(normalized)
+        scanned[normalized] = file_info
+    return scanned
+
 @app.route('/queue/scan_files', methods=['POST'])
 def scan_files_and_match():
     """Scan download directory and store file info for later matching"""
-    print("[SCAN] Starting file scan...")
+    log.info("[SCAN] Starting file scan...")
     try:
         if not os.path.exists(DOWNLOAD_PATH):
             error_msg = f'Download directory does not exist: {DOWNLOAD_PATH}'
-            print(f"[SCAN] ERROR: {error_msg}")
+            log.error("[SCAN] ERROR: %s", error_msg)
             return jsonify({'status': 'error', 'message': error_msg}), 404
         
         global SCANNED_FILES
-        SCANNED_FILES = {}  # Reset scanned files
-        files_found = []
+        log.info("[SCAN] Scanning download directory...")
         
-        print("[SCAN] Scanning download directory...")
-        file_list = os.listdir(DOWNLOAD_PATH)
-        print(f"[SCAN] Found {len(file_list)} items in download directory")
-        
-        for filename in file_list:
-            filepath = os.path.join(DOWNLOAD_PATH, filename)
-            if os.path.isfile(filepath) and os.path.getsize(filepath) > 1024 * 1024:
-                size_mb = round(os.path.getsize(filepath) / (1024 * 1024), 2)
-                
-                # Extract metadata from filename
-                file_info = extract_episode_info(filename)
-                file_info.update({
-                    'filename': filename,
-                    'size_mb': size_mb,
-                    'scanned_at': time.time()
-                })
-                
-                # Store normalized for matching
-                normalized = normalize_filename_for_matching(filename)
-                SCANNED_FILES[normalized] = file_info
-                
-                files_found.append({
-                    'filename': filename,
-                    'size_mb': size_mb,
-                    'type': file_info.get('type', 'unknown'),
-                    'season': file_info.get('season'),
-                    'episode': file_info.get('episode'),
-                    'series_name': file_info.get('series_name')
-                })
+        scanned = scan_download_folder()  # Published as SCANNED_FILES once complete
+        files_found = [{
+            'filename': file_info['filename'],
+            'size_mb': file_info['size_mb'],
+            'type': file_info.get('type', 'unknown'),
+            'season': file_info.get('season'),
+            'episode': file_info.get('episode'),
+            'series_name': file_info.get('series_name')
+        } for file_info in scanned.values()]
         
-        print(f"[SCAN] Complete: Scanned {len(files_found)} files")
-        print(f"[SCAN] Files stored for matching. They will be matched when you view categories.")
+        SCANNED_FILES = scanned
+        log.info("[SCAN] Complete: Scanned %d files", len(files_found))
+        log.info("[SCAN] Files stored for matching. They will be matched when you view categories.")
         
         # Now try to match with items already in DOWNLOADED_ITEMS to avoid duplicates
         # This is optional - just a quick check
@@ -926,35 +1517,75 @@ def scan_files_and_match():
         })
     except Exception as e:
         error_msg = f"Fatal error during file scan: {e}"
-        print(f"[SCAN] FATAL ERROR: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        log.exception("[SCAN] FATAL ERROR: %s", error_msg)
         return jsonify({
             'status': 'error',
             'message': error_msg,
             'error_type': type(e).__name__
         }), 500
 
+_MATCH_INDEX = None  # (SCANNED_FILES it was built from, movie lengths, movie names, movie entries, episodes by (season, episode))
+
+def _get_match_index():
+    """
+    Lookup structures over SCANNED_FILES, rebuilt only when a scan has
+    published a new dict. Movies are sorted by normalized name length, because
+    a match must be within a factor of two in length, and kept as parallel
+    lists (lengths for bisect, names for the substring test, entries to
+    return) so the match loop never touches the dicts; episodes are bucketed by
+    (season, episode) so an item only looks at files with the same numbers.
+    """
+    global _MATCH_INDEX
+    files = SCANNED_FILES
+    index = _MATCH_INDEX
+    if index is None or index[0] is not files:
+        movies = sorted((file_info for file_info in files.values() if file_info.get('type') == 'movie'),
+                        key=lambda file_info: file_info['_nlen'])
+        movie_lengths = [file_info['_nlen'] for file_info in movies]
+        movie_names = [file_info['_normalized'] for file_info in movies]
+        episodes = {}
+        for file_info in files.values():
+            if file_info.get('type') == 'episode':
+                episodes.setdefault((file_info['season'], file_info['episode']), []).append(file_info)
+        index = _MATCH_INDEX = (files, movie_lengths, movie_names, movies, episodes)
+    return index
+
+def _as_int(value):
+    """int(value), or None if it is missing or not a number (API fields are often strings)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
 def match_file_to_item(item, item_id, item_type):
     """Check if an item matches any scanned file"""
-    global SCANNED_FILES
-    
     if not SCANNED_FILES:
         return None
+    _, movie_lengths, movie_names, movie_files, episode_files = _get_match_index()
     
     if item_type == "movie":
         # For movies, match by name
         movie_name = item.get('name', '')
         normalized_movie = normalize_filename_for_matching(movie_name)
         
+        # A file with exactly this name is the common case - one dict lookup
+        file_info = SCANNED_FILES.get(normalized_movie)
+        if normalized_movie and file_info and file_info.get('type') == 'movie':
+            return file_info
+        
+        # Names should be similar length, not just substrings: only files more
+        # than half and less than twice as long qualify, and they sit in one
+        # sorted slice, so the length check runs before any substring search
+        length = len(normalized_movie)
+        start = bisect.bisect_right(movie_lengths, length / 2)
+        end = bisect.bisect_left(movie_lengths, length * 2)
+        
         # Check if any scanned file matches this movie name
-        for normalized_file, file_info in SCANNED_FILES.items():
-            if file_info.get('type') == 'movie':
-                # Check if movie name is in filename or vice versa
-                if normalized_movie in normalized_file or normalized_file in normalized_movie:
-                    # Additional check: names should be similar length (not just substring)
-                    if abs(len(normalized_movie) - len(normalized_file)) < max(len(normalized_movie), len(normalized_file)) * 0.5:
-                        return file_info
+        for i in range(start, end):
+            normalized_file = movie_names[i]
+            # Check if movie name is in filename or vice versa
+            if normalized_movie in normalized_file or normalized_file in normalized_movie:
+                return movie_files[i]
     else:
         # For series episodes, match by season/episode and series name
         series_name = item.get('_series_name') or item.get('series_name', '')
@@ -964,56 +1595,63 @@ def match_file_to_item(item, item_id, item_type):
         if season and episode_num and series_name:
             normalized_series = normalize_filename_for_matching(series_name)
             
-            for normalized_file, file_info in SCANNED_FILES.items():
-                if file_info.get('type') == 'episode':
-                    if (file_info.get('season') == season and 
-                        file_info.get('episode') == episode_num):
-                        # Check series name match
-                        file_series = file_info.get('normalized_series', '')
-                        if normalized_series in file_series or file_series in normalized_series:
-                            return file_info
+            # Scanned numbers are ints; the API may send "1" instead of 1
+            for file_info in episode_files.get((_as_int(season), _as_int(episode_num)), ()):
+                # Check series name match
+                # A file without a "Series - " prefix has no name to compare -
+                # '' is a substring of every series, so never match on it
+                file_series = file_info.get('normalized_series')
+                if file_series and (normalized_series in file_series or file_series in normalized_series):
+                    return file_info
     
     return None
 
 # Auto-scan download folder on startup (called after helper functions are defined)
 def auto_scan_on_startup():
     """Auto-scan download folder on startup to populate scanned files"""
-    print("[STARTUP] Auto-scanning download folder...")
+    log.info("[STARTUP] Auto-scanning download folder...")
     try:
         if os.path.exists(DOWNLOAD_PATH):
             global SCANNED_FILES
-            SCANNED_FILES = {}
-            file_count = 0
-            
-            file_list = os.listdir(DOWNLOAD_PATH)
-            for filename in file_list:
-                filepath = os.path.join(DOWNLOAD_PATH, filename)
-                if os.path.isfile(filepath) and os.path.getsize(filepath) > 1024 * 1024:
-                    size_mb = round(os.path.getsize(filepath) / (1024 * 1024), 2)
-                    
-                    # Extract metadata from filename
-                    file_info = extract_episode_info(filename)
-                    file_info.update({
-                        'filename': filename,
-                        'size_mb': size_mb,
-                        'scanned_at': time.time()
-                    })
-                    
-                    # Store normalized for matching
-                    normalized = normalize_filename_for_matching(filename)
-                    SCANNED_FILES[normalized] = file_info
-                    file_count += 1
-            
-            print(f"[STARTUP] ✓ Auto-scan complete: Found {file_count} files ready for matching")
+            SCANNED_FILES = scan_download_folder()
+            file_count = len(SCANNED_FILES)
+            log.info("[STARTUP] ✓ Auto-scan complete: Found %d files ready for matching", file_count)
         else:
-            print(f"[STARTUP] Download path does not exist: {DOWNLOAD_PATH}")
+            log.warning("[STARTUP] Download path does not exist: %s", DOWNLOAD_PATH)
     except Exception as e:
-        print(f"[STARTUP] Error during auto-scan: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("[STARTUP] Error during auto-scan: %s", e)
+
+def _is_reloader_watcher():
+    """
+    True in the file-watcher process of 'flask run' with the reloader on
+    (--debug or --reload). It imports this module but never serves requests;
+    it spawns a child with WERKZEUG_RUN_MAIN=true that does. gunicorn,
+    waitress and python app.py never set FLASK_RUN_FROM_CLI, so FLASK_DEBUG
+    alone does not skip anything there.
+    """
+    if os.environ.get("FLASK_RUN_FROM_CLI") != "true" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        return False
+    args = sys.argv[1:]
+    if "run" not in args or "--no-reload" in args:
+        return False
+    return "--reload" in args or app.debug  # The reloader defaults to on in debug mode
 
-# Run auto-scan after all helper functions are defined
-auto_scan_on_startup()
+# Run auto-scan after all helper functions are defined - only the serving
+# child needs SCANNED_FILES, not the reloader's watcher
+if not _is_reloader_watcher():
+    auto_scan_on_startup()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, threaded=True)
+    # Prefer waitress when it is installed (it also runs on Windows, unlike
+    # gunicorn); one process and a thread pool, like the gunicorn setup.
+    # Open /events streams use up to EVENT_STREAM_MAX_CLIENTS of the threads
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    if serve:
+        print("Serving with waitress on 0.0.0.0:5000")
+        serve(app, host='0.0.0.0', port=5000, threads=16)
+    else:
+        print("NOTE: Running the Flask development server. For production use gunicorn (see wsgi.py) or pip install waitress.")
+        app.run(host='0.0.0.0', port=5000, threaded=True)
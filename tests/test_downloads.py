@@ -0,0 +1,83 @@
+"""Regression tests for the download workers (python -m unittest)"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# app.py scans DOWNLOAD_PATH and opens the database at import time
+_TMP = tempfile.mkdtemp()
+os.environ["DOWNLOAD_PATH"] = os.path.join(_TMP, "downloads")
+os.environ["DB_FILE_PATH"] = os.path.join(_TMP, "downloaded_items.db")
+os.makedirs(os.environ["DOWNLOAD_PATH"])
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class FakeRangeResponse:
+    """
+    Endless 206 body for one Range request. Every chunk read is timestamped
+    in reads[start]; with fail_after set, read() raises after that many
+    chunks and the time of the failure goes in failed_at.
+    """
+    def __init__(self, start, reads, failed_at, fail_after=0):
+        self.start = start
+        self.reads = reads
+        self.failed_at = failed_at
+        self.fail_after = fail_after
+        self.status_code = 206
+        self.headers = {}
+        self.raw = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def read(self, size):
+        if self.fail_after and len(self.reads[self.start]) >= self.fail_after:
+            self.failed_at.append(time.monotonic())
+            raise IOError("connection reset")
+        time.sleep(0.005)
+        self.reads[self.start].append(time.monotonic())
+        return b"\0" * size
+
+
+class SegmentedDownloadTest(unittest.TestCase):
+    def test_failed_segment_stops_the_others_within_a_chunk(self):
+        segments, chunk = 4, 4096
+        total = segments * 1000 * chunk  # Far more than the siblings can fetch before the failure
+        size = total // segments
+        last_start = (segments - 1) * size
+        reads = {start: [] for start in range(0, total, size)}
+        failed_at = []
+
+        def fake_get(url, stream, headers):
+            start = int(headers['Range'].split('=')[1].split('-')[0])
+            # Failing the last-submitted segment checks that the order of submission does not matter
+            return FakeRangeResponse(start, reads, failed_at, fail_after=3 if start == last_start else 0)
+
+        progress = app.DownloadProgress("test", total)
+        path = os.path.join(app.DOWNLOAD_PATH, "segments.part")
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        with mock.patch.object(app, "DOWNLOAD_SEGMENTS", segments), \
+             mock.patch.object(app, "DOWNLOAD_CHUNK_SIZE", chunk), \
+             mock.patch.object(app.SESSION, "get", fake_get):
+            with self.assertRaises(IOError):
+                app.download_segments("http://provider/movie.mp4", path, progress)
+
+        self.assertTrue(progress.failed)
+        for start, times in reads.items():
+            if start != last_start:
+                # At most the read already in flight when the flag was set
+                self.assertLessEqual(sum(t > failed_at[0] for t in times), 1, start)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Regression tests for matching scanned files to provider items (python -m unittest)"""
+import os
+import sys
+import tempfile
+import unittest
+
+# app.py scans DOWNLOAD_PATH and opens the database at import time
+_TMP = tempfile.mkdtemp()
+os.environ["DOWNLOAD_PATH"] = os.path.join(_TMP, "downloads")
+os.environ["DB_FILE_PATH"] = os.path.join(_TMP, "downloaded_items.db")
+os.makedirs(os.environ["DOWNLOAD_PATH"])
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class EpisodeMatchingTest(unittest.TestCase):
+    def setUp(self):
+        self.files = []
+        self._saved = app.SCANNED_FILES
+
+    def tearDown(self):
+        for path in self.files:
+            os.remove(path)
+        app.SCANNED_FILES = self._saved
+
+    def scan(self, *names):
+        for name in names:
+            path = os.path.join(app.DOWNLOAD_PATH, name)
+            with open(path, "wb") as f:
+                f.truncate(app.MIN_FILE_SIZE + 1)
+            self.files.append(path)
+        app.SCANNED_FILES = app.scan_download_folder()
+
+    def test_file_without_series_name_matches_no_series(self):
+        self.scan("Show.S01E01.mkv")
+        item = {"_series_name": "Totally Different", "season": "1", "episode_num": "1"}
+        self.assertIsNone(app.match_file_to_item(item, "series:1", "series"))
+
+    def test_named_episode_still_matches(self):
+        self.scan("Show Name - S01E02 - Pilot.mkv")
+        item = {"_series_name": "Show Name", "season": "1", "episode_num": "2"}
+        match = app.match_file_to_item(item, "series:2", "series")
+        self.assertEqual(match["filename"], "Show Name - S01E02 - Pilot.mkv")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,14 @@
+"""
+WSGI entry point for production servers, e.g.:
+
+    gunicorn --workers 1 --worker-class gthread --threads 16 --bind 0.0.0.0:5000 wsgi:application
+
+Keep --workers at 1: the download queue, worker threads and progress state
+live in process memory, so extra processes would each run their own queue.
+Scale with --threads instead. Each open browser tab holds one thread for its
+/events stream; EVENT_STREAM_MAX_CLIENTS (default 8) caps those so the rest
+stay free for requests.
+"""
+from app import app
+
+application = app